@@ -1,35 +1,73 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
 load_dotenv()
-import mysql.connector
 import os
 import logging
-from datetime import datetime
+from datetime import date, datetime
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 from config import Config
 from image_processor import analyze_plant_health
+import auth_utils
+import image_processor
+from storage import create_storage, DuplicateError
+
+class JSONProvider(DefaultJSONProvider):
+    """Serialize dates as ISO 8601 strings so JavaScript can parse them directly"""
+    @staticmethod
+    def default(o):
+        if isinstance(o, (date, datetime)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 app.config.from_object(Config)
+if app.config['PROXY_FIX_X_FOR']:
+    # Take the client IP from X-Forwarded-For so login rate limits apply per client, not per proxy
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 app.secret_key = app.config['SECRET_KEY']
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+auth_utils.configure(app)
+image_processor.configure(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_db():
-    """Get database connection with error handling"""
-    try:
-        return mysql.connector.connect(
-            host=app.config['MYSQL_HOST'], 
-            user=app.config['MYSQL_USER'],
-            password=app.config['MYSQL_PASSWORD'], 
-            database=app.config['MYSQL_DB']
-        )
-    except mysql.connector.Error as err:
-        logger.error(f"Database connection error: {err}")
-        raise
+# Data access (MySQL or embedded SQLite, see DB_BACKEND in config.py)
+db = create_storage(app.config)
+
+def check_login_rate_limit(email):
+    """Return a 429 response if this client IP or email has too many recent failed logins"""
+    ip = request.remote_addr or 'unknown'
+    if auth_utils.ip_limiter.is_limited(ip) or auth_utils.email_limiter.is_limited(email):
+        retry_after = max(auth_utils.ip_limiter.retry_after(ip), auth_utils.email_limiter.retry_after(email))
+        logger.warning(f"Login rate limit hit for {email} from {ip}")
+        response = jsonify({'success': False, 'message': 'Too many login attempts. Please try again later.'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    return None
+
+def authenticate(email, password, role=None):
+    """Verify credentials and upgrade plaintext or outdated password hashes on success"""
+    user = db.users.get_by_email(email, role=role)
+
+    if user and auth_utils.verify_password(user['password'], password):
+        iterations = app.config['PASSWORD_HASH_ITERATIONS']
+        if auth_utils.needs_rehash(user['password'], iterations):
+            try:
+                db.users.update_password(user['id'], auth_utils.hash_password(password, iterations))
+            except Exception as e:
+                logger.error(f"Password rehash failed for user {user['id']}: {e}")
+        auth_utils.email_limiter.reset(email)
+    else:
+        # Only failures count, so many users logging in from one NAT/proxy address aren't throttled
+        user = None
+        auth_utils.email_limiter.hit(email)
+        auth_utils.ip_limiter.hit(request.remote_addr or 'unknown')
+    return user
 
 @app.route('/')
 def index(): 
@@ -44,12 +82,12 @@ def login():
             if not data.get('email') or not data.get('password'):
                 return jsonify({'success': False, 'message': 'Email and password required'})
             
-            conn = get_db()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM users WHERE email=%s AND password=%s", (data['email'], data['password']))
-            user = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            email = data['email'].strip().lower()
+            limited = check_login_rate_limit(email)
+            if limited:
+                return limited
+            
+            user = authenticate(email, data['password'])
             
             if user:
                 session['user_id'] = user['id']
@@ -72,18 +110,11 @@ def signup():
             if not all(data.get(field) for field in required):
                 return jsonify({'success': False, 'message': 'All fields are required'})
             
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO users (fullname, email, phone, password) VALUES (%s, %s, %s, %s)",
-                           (data['fullname'], data['email'], data['phone'], data['password']))
-            conn.commit()
-            cursor.close()
-            conn.close()
+            password_hash = auth_utils.hash_password(data['password'], app.config['PASSWORD_HASH_ITERATIONS'])
+            db.users.create(data['fullname'], data['email'].strip().lower(), data['phone'], password_hash)
             return jsonify({'success': True})
-        except mysql.connector.Error as err:
-            if 'Duplicate' in str(err):
-                return jsonify({'success': False, 'message': 'Email already exists'})
-            return jsonify({'success': False, 'message': 'Database Error'})
+        except DuplicateError:
+            return jsonify({'success': False, 'message': 'Email already exists'})
         except Exception as e:
             logger.error(f"Signup Error: {e}")
             return jsonify({'success': False, 'message': 'Server Error'})
@@ -115,17 +146,21 @@ def detect():
         
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
-        result = analyze_plant_health(filepath)
+        # Large images (drone frames, panoramas) are analyzed in parallel tiles to bound memory;
+        # send tiled=1 to force tiling and get a per-tile heatmap for any image
+        force_tiled = request.form.get('tiled') in ('1', 'true', 'on')
+        result = analyze_plant_health(
+            filepath,
+            tile_size=app.config['ANALYSIS_TILE_SIZE'],
+            tile_min_pixels=0 if force_tiled else app.config['ANALYSIS_TILE_MIN_PIXELS'],
+            max_pixels=app.config['MAX_IMAGE_PIXELS']
+        )
         
+        # The packed feature vector is stored for re-scoring (rescore.py), not returned to the client
+        features = result.pop('features', None)
         try:
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO predictions (user_id, image_path, plant_type, disease_name, status, severity_score) VALUES (%s, %s, %s, %s, %s, %s)",
-                        (session['user_id'], f"uploads/{filename}", request.form.get('plant-type', 'Unknown'), 
-                         result['disease_name'], result['status'], result['confidence']))
-            conn.commit()
-            cursor.close()
-            conn.close()
+            db.predictions.add(session['user_id'], f"uploads/{filename}", request.form.get('plant-type', 'Unknown'),
+                               result['disease_name'], result['status'], result['confidence'], features)
         except Exception as e:
             logger.error(f"DB Error during prediction save: {e}")
             
@@ -140,34 +175,30 @@ def history():
     try:
         if 'user_id' not in session: 
             return redirect('/login')
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM predictions WHERE user_id=%s ORDER BY created_at DESC", (session.get('user_id'),))
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        data = db.predictions.for_user(session.get('user_id'))
         return render_template('user/result.html', history=data)
     except Exception as e:
         logger.error(f"History error: {e}")
         return render_template('user/result.html', history=[])
 
+@app.route('/api/history')
+def history_api():
+    """Get the user's prediction history as JSON"""
+    try:
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'history': []}), 401
+        return jsonify({'success': True, 'history': db.predictions.for_user(session['user_id'])})
+    except Exception as e:
+        logger.error(f"History API error: {e}")
+        return jsonify({'success': False, 'history': []}), 500
+
 @app.route('/alerts')
 def alerts():
     try:
         if 'user_id' not in session:
             return redirect('/login')
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
         # Get alerts specific to this user
-        cursor.execute("""
-            SELECT a.*, ua.id as user_alert_id, ua.is_read 
-            FROM alerts a
-            LEFT JOIN user_alerts ua ON a.id = ua.alert_id AND ua.user_id=%s
-            ORDER BY a.created_at DESC LIMIT 20
-        """, (session['user_id'],))
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        data = db.alerts.for_user(session['user_id'], limit=20)
         return render_template('user/useralerts.html', alerts=data)
     except Exception as e:
         logger.error(f"Alerts error: {e}")
@@ -179,17 +210,7 @@ def notifications():
     try:
         if 'user_id' not in session:
             return redirect('/login')
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT * FROM notifications 
-            WHERE user_id=%s 
-            ORDER BY created_at DESC 
-            LIMIT 50
-        """, (session['user_id'],))
-        notifs = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        notifs = db.notifications.list_for_user(session['user_id'], limit=50)
         return render_template('user/notifications.html', notifications=notifs)
     except Exception as e:
         logger.error(f"Notifications error: {e}")
@@ -201,16 +222,7 @@ def get_unread_notifications():
     try:
         if 'user_id' not in session:
             return jsonify({'count': 0}), 401
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT COUNT(*) as count FROM notifications WHERE user_id=%s AND is_read=FALSE",
-            (session['user_id'],)
-        )
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        return jsonify({'count': result[0]})
+        return jsonify({'count': db.notifications.unread_count(session['user_id'])})
     except Exception as e:
         logger.error(f"Unread notifications error: {e}")
         return jsonify({'count': 0}), 500
@@ -221,47 +233,78 @@ def mark_notification_read(notif_id):
     try:
         if 'user_id' not in session:
             return jsonify({'success': False}), 401
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE notifications SET is_read=TRUE, read_at=NOW() WHERE id=%s AND user_id=%s",
-            (notif_id, session['user_id'])
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        db.notifications.mark_read(notif_id, session['user_id'])
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f"Mark read error: {e}")
         return jsonify({'success': False}), 500
 
+def notifications_poll(user_id, since_id):
+    """
+    Return (etag, payload) for a notification list request with one database query
+    (shared with the async API in asgi.py)
+    """
+    latest_id, unread, notifs = db.notifications.poll(user_id, since_id, limit=50)
+    etag = f"n{user_id}-{since_id if since_id is not None else 'all'}-{latest_id}-{unread}"
+    return etag, {'success': True, 'notifications': notifs, 'latest_id': latest_id, 'unread_count': unread}
+
+def is_db_id(value):
+    """True for an int that fits a 64-bit database integer (bool is a subclass of int, so it is excluded)"""
+    return isinstance(value, int) and not isinstance(value, bool) and -2**63 <= value < 2**63
+
+@app.route('/api/notifications/read', methods=['POST'])
+def mark_notifications_read():
+    """Mark many notifications as read in one statement: {"ids": [...]} or {"up_to_id": N}"""
+    try:
+        if 'user_id' not in session:
+            return jsonify({'success': False}), 401
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'message': 'JSON object required'}), 400
+        ids = data.get('ids') or []
+        up_to_id = data.get('up_to_id')
+        if not isinstance(ids, list) or not all(is_db_id(i) for i in ids):
+            return jsonify({'success': False, 'message': 'ids must be a list of integers'}), 400
+        if up_to_id is not None and not is_db_id(up_to_id):
+            return jsonify({'success': False, 'message': 'up_to_id must be an integer'}), 400
+        if ids and up_to_id is not None:
+            return jsonify({'success': False, 'message': 'Send either ids or up_to_id, not both'}), 400
+        if not ids and up_to_id is None:
+            return jsonify({'success': False, 'message': 'ids or up_to_id required'}), 400
+        max_ids = app.config['NOTIFICATION_READ_BATCH_MAX']
+        if len(ids) > max_ids:
+            return jsonify({'success': False, 'message': f'At most {max_ids} ids per request'}), 400
+        updated = db.notifications.mark_read_many(session['user_id'], ids=ids, up_to_id=up_to_id)
+        return jsonify({'success': True, 'updated': updated})
+    except Exception as e:
+        logger.error(f"Batch mark read error: {e}")
+        return jsonify({'success': False}), 500
+
 @app.route('/api/notifications/list')
 def get_notifications_api():
-    """Get notifications via API"""
+    """
+    Get notifications via API.
+    With ?since_id=N only notifications newer than N are returned. Responses carry an
+    ETag built from the latest id and unread count, so an unchanged poll gets a 304.
+    """
     try:
         if 'user_id' not in session:
             return jsonify({'success': False, 'notifications': []}), 401
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT * FROM notifications 
-            WHERE user_id=%s 
-            ORDER BY created_at DESC 
-            LIMIT 50
-        """, (session['user_id'],))
-        notifs = cursor.fetchall()
+        user_id = session['user_id']
+        since_id = request.args.get('since_id', type=int)
         
-        # Convert datetime objects to ISO format strings for JavaScript
-        for notif in notifs:
-            if notif.get('created_at'):
-                notif['created_at'] = notif['created_at'].isoformat()
-            if notif.get('read_at'):
-                notif['read_at'] = notif['read_at'].isoformat()
+        etag, payload = notifications_poll(user_id, since_id)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            return response
         
-        cursor.close()
-        conn.close()
-        logger.info(f"Returning {len(notifs)} notifications for user {session['user_id']}")
-        return jsonify({'success': True, 'notifications': notifs})
+        if payload['notifications']:
+            logger.info(f"Returning {len(payload['notifications'])} notifications for user {user_id}")
+        response = jsonify(payload)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     except Exception as e:
         logger.error(f"Get notifications API error: {e}")
         return jsonify({'success': False, 'notifications': []}), 500
@@ -285,15 +328,8 @@ def test_notification():
         if 'user_id' not in session:
             return jsonify({'success': False, 'message': 'Not logged in'}), 401
         
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO notifications (user_id, type, title, message, is_read)
-            VALUES (%s, %s, %s, %s, FALSE)
-        """, (session['user_id'], 'test', 'Test Notification', 'This is a test notification to verify the system is working.'))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        db.notifications.create(session['user_id'], 'test', 'Test Notification',
+                                'This is a test notification to verify the system is working.')
         logger.info(f"Test notification created for user {session['user_id']}")
         return jsonify({'success': True, 'message': 'Test notification created'})
     except Exception as e:
@@ -322,13 +358,15 @@ def admin_login():
     if request.method == 'POST':
         try:
             data = request.json
-            conn = get_db()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM users WHERE email=%s AND password=%s AND role='admin'", 
-                          (data['email'], data['password']))
-            user = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            if not data.get('email') or not data.get('password'):
+                return jsonify({'success': False, 'message': 'Email and password required'})
+            
+            email = data['email'].strip().lower()
+            limited = check_login_rate_limit(email)
+            if limited:
+                return limited
+            
+            user = authenticate(email, data['password'], role='admin')
             
             if user:
                 session['user_id'] = user['id']
@@ -346,38 +384,16 @@ def admin_dashboard():
     if session.get('role') != 'admin': 
         return redirect('/admin/login')
     try:
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT COUNT(*) as c FROM users WHERE role='user'")
-        u = cursor.fetchone()['c']
-        cursor.execute("SELECT COUNT(*) as c FROM predictions")
-        r = cursor.fetchone()['c']
-        cursor.execute("SELECT COUNT(*) as c FROM alerts")
-        a = cursor.fetchone()['c']
+        u = db.users.count(role='user')
+        r = db.predictions.count()
+        a = db.alerts.count()
         
         # Get recent activity
-        cursor.execute("""
-            SELECT p.*, u.fullname, u.email 
-            FROM predictions p 
-            JOIN users u ON p.user_id=u.id 
-            ORDER BY p.created_at DESC 
-            LIMIT 5
-        """)
-        act = cursor.fetchall()
+        act = db.predictions.recent_with_users(limit=5)
         
         # NEW CODE: Fetch Critical Cases for Admin Visibility
-        cursor.execute("""
-            SELECT p.*, u.fullname, u.email 
-            FROM predictions p 
-            JOIN users u ON p.user_id=u.id 
-            WHERE p.status = 'Critical'
-            ORDER BY p.created_at DESC 
-            LIMIT 5
-        """)
-        critical_cases = cursor.fetchall()
+        critical_cases = db.predictions.recent_with_users(limit=5, status='Critical')
         
-        cursor.close()
-        conn.close()
         return render_template('admin/dashboard.html', 
                              user_count=u, 
                              report_count=r, 
@@ -393,12 +409,7 @@ def admin_history():
     if session.get('role') != 'admin': 
         return redirect('/admin/login')
     try:
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT p.*, u.fullname FROM predictions p JOIN users u ON p.user_id=u.id ORDER BY p.created_at DESC")
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        data = db.predictions.recent_with_users()
         return render_template('admin/history.html', history=data)
     except Exception as e:
         logger.error(f"Admin history error: {e}")
@@ -409,17 +420,11 @@ def admin_alerts():
     if session.get('role') != 'admin': 
         return redirect('/admin/login')
     try:
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM alerts ORDER BY created_at DESC")
-        data = cursor.fetchall()
+        data = db.alerts.all()
         
         # Fetch users for dropdown
-        cursor.execute("SELECT id, fullname, email FROM users WHERE role='user' ORDER BY fullname")
-        users = cursor.fetchall()
+        users = db.users.list_by_role('user')
         
-        cursor.close()
-        conn.close()
         return render_template('admin/alert.html', alert_history=data, users=users)
     except Exception as e:
         logger.error(f"Admin alerts error: {e}")
@@ -436,14 +441,8 @@ def send_alert():
         
         target_users = d.get('target_users', 'all')  # 'all' or comma-separated user IDs
         
-        conn = get_db()
-        cursor = conn.cursor()
-        
         # Insert alert into alerts table
-        cursor.execute("INSERT INTO alerts (priority, disease_name, region, message) VALUES (%s, %s, %s, %s)",
-                    (d['priority'], d['disease'], d['region'], d['message']))
-        conn.commit()
-        alert_id = cursor.lastrowid
+        alert_id = db.alerts.create(d['priority'], d['disease'], d['region'], d['message'])
         logger.info(f"Alert created with ID: {alert_id}")
         
         # Determine target users
@@ -460,10 +459,9 @@ def send_alert():
         
         elif target_users.lower() == 'all':
             # Case 2: All Registered Users
-            cursor.execute("SELECT id, email FROM users WHERE role='user'")
-            users = cursor.fetchall()
-            user_ids = [u[0] for u in users]
-            user_emails = [u[1] for u in users if u[1]]
+            users = db.users.list_by_role('user')
+            user_ids = [u['id'] for u in users]
+            user_emails = [u['email'] for u in users if u['email']]
             logger.info(f"Target users: {user_ids}")
             
         else:
@@ -472,14 +470,10 @@ def send_alert():
                 raw_ids = [int(uid.strip()) for uid in target_users.split(',') if uid.strip()]
                 if raw_ids:
                     # Fetch valid users and their emails
-                    placeholders = ','.join(['%s'] * len(raw_ids))
-                    cursor.execute(f"SELECT id, email FROM users WHERE id IN ({placeholders})", tuple(raw_ids))
-                    users = cursor.fetchall()
-                    user_ids = [u[0] for u in users]
-                    user_emails = [u[1] for u in users if u[1]]
+                    users = db.users.get_many(raw_ids)
+                    user_ids = [u['id'] for u in users]
+                    user_emails = [u['email'] for u in users if u['email']]
             except ValueError:
-                cursor.close()
-                conn.close()
                 return jsonify({'success': False, 'message': 'Invalid user IDs'})
                 
         # Send Email Alert
@@ -500,27 +494,13 @@ def send_alert():
             except Exception as e:
                 logger.error(f"Failed to initiate email sending: {e}")
         
-        # Create user_alerts entries and notifications
+        # Create user_alerts entries and notifications (batched, one transaction)
         notification_count = 0
-        for uid in user_ids:
-            try:
-                cursor.execute("""
-                    INSERT INTO user_alerts (user_id, alert_id, is_read, notified_at)
-                    VALUES (%s, %s, FALSE, NOW())
-                    ON DUPLICATE KEY UPDATE is_read=FALSE
-                """, (uid, alert_id))
-                
-                cursor.execute("""
-                    INSERT INTO notifications (user_id, type, title, message, related_alert_id, is_read)
-                    VALUES (%s, %s, %s, %s, %s, FALSE)
-                """, (uid, 'alert', f'Alert: {d["disease"]}', d['message'], alert_id))
-                notification_count += 1
-            except Exception as e:
-                logger.error(f"Error creating notification for user {uid}: {e}")
+        try:
+            notification_count = db.alerts.deliver(alert_id, user_ids, f'Alert: {d["disease"]}', d['message'])
+        except Exception as e:
+            logger.error(f"Error creating notifications for alert {alert_id}: {e}")
         
-        conn.commit()
-        cursor.close()
-        conn.close()
         logger.info(f"Alert sent successfully. Created {notification_count} notifications for {len(user_ids)} users: {d['disease']} in {d['region']}")
         return jsonify({'success': True, 'message': f'Alert sent to {len(user_ids)} user(s)'})
     except Exception as e:
@@ -544,17 +524,10 @@ def send_broadcast():
         if not content:
             return jsonify({'success': False, 'message': 'Content is required'})
 
-        conn = get_db()
-        cursor = conn.cursor()
-        
         # Reuse logic: Fetch all user emails
         # For broadcast, default is usually ALL
-        cursor.execute("SELECT email FROM users WHERE role='user'")
-        users = cursor.fetchall()
-        user_emails = [u[0] for u in users if u[0]]
-        
-        cursor.close()
-        conn.close()
+        users = db.users.list_by_role('user')
+        user_emails = [u['email'] for u in users if u['email']]
         
         # Send Email using the new helper
         if user_emails:
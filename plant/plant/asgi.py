@@ -0,0 +1,141 @@
+"""
+ASGI entry point with async handlers for the polling JSON APIs.
+
+Every logged-in browser polls /api/notifications/* every few seconds. Under
+the WSGI server each in-flight poll holds an OS thread for the whole request;
+here the polls are coroutines and only the database call itself is offloaded
+to a small, bounded thread pool, so thousands of idle pollers cost sockets,
+not threads. All other routes are passed through to the Flask app unchanged,
+on their own pool of WSGI_THREADS threads so slow requests (password hashing,
+image analysis) run concurrently instead of queueing on one thread.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie, parse_etags, quote_etag
+
+from app import app, db, notifications_poll
+
+logger = logging.getLogger(__name__)
+
+wsgi_application = WSGIMiddleware(app, workers=app.config['WSGI_THREADS'])
+db_executor = ThreadPoolExecutor(max_workers=app.config['ASYNC_DB_THREADS'], thread_name_prefix='async-db')
+session_serializer = app.session_interface.get_signing_serializer(app)
+session_max_age = int(app.permanent_session_lifetime.total_seconds())
+
+
+async def run_db(func, *args):
+    """Run a blocking storage call on the DB thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, func, *args)
+
+
+def get_header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def load_session(scope):
+    """Decode the Flask session cookie, returning {} if it is missing or invalid."""
+    cookie_header = get_header(scope, b'cookie')
+    if not cookie_header:
+        return {}
+    value = parse_cookie(cookie_header).get(app.config['SESSION_COOKIE_NAME'])
+    if not value:
+        return {}
+    try:
+        return session_serializer.loads(value, max_age=session_max_age)
+    except BadSignature:
+        return {}
+
+
+async def send_response(send, status, body=b'', headers=None):
+    header_list = [(b'content-length', str(len(body)).encode())]
+    for key, value in (headers or {}).items():
+        header_list.append((key.encode('latin-1'), value.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': header_list})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, status, payload, headers=None):
+    headers = dict(headers or {})
+    headers['content-type'] = 'application/json'
+    await send_response(send, status, app.json.dumps(payload).encode('utf-8'), headers)
+
+
+async def unread_notifications(scope, send, session):
+    user_id = session.get('user_id')
+    if not user_id:
+        return await send_json(send, 401, {'count': 0})
+    try:
+        count = await run_db(db.notifications.unread_count, user_id)
+        await send_json(send, 200, {'count': count})
+    except Exception as e:
+        logger.error(f"Async unread notifications error: {e}")
+        await send_json(send, 500, {'count': 0})
+
+
+async def list_notifications(scope, send, session):
+    user_id = session.get('user_id')
+    if not user_id:
+        return await send_json(send, 401, {'success': False, 'notifications': []})
+    try:
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        try:
+            since_id = int(query['since_id'][0]) if 'since_id' in query else None
+        except ValueError:
+            since_id = None
+
+        etag, payload = await run_db(notifications_poll, user_id, since_id)
+        headers = {'etag': quote_etag(etag, weak=True), 'cache-control': 'private, no-cache'}
+        if parse_etags(get_header(scope, b'if-none-match')).contains_weak(etag):
+            return await send_response(send, 304, headers=headers)
+        await send_json(send, 200, payload, headers)
+    except Exception as e:
+        logger.error(f"Async notifications list error: {e}")
+        await send_json(send, 500, {'success': False, 'notifications': []})
+
+
+async def history(scope, send, session):
+    user_id = session.get('user_id')
+    if not user_id:
+        return await send_json(send, 401, {'success': False, 'history': []})
+    try:
+        rows = await run_db(db.predictions.for_user, user_id)
+        await send_json(send, 200, {'success': True, 'history': rows})
+    except Exception as e:
+        logger.error(f"Async history error: {e}")
+        await send_json(send, 500, {'success': False, 'history': []})
+
+
+ASYNC_ROUTES = {
+    ('GET', '/api/notifications/unread'): unread_notifications,
+    ('GET', '/api/notifications/list'): list_notifications,
+    ('GET', '/api/history'): history,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        handler = ASYNC_ROUTES.get((scope['method'], scope['path']))
+        if handler:
+            return await handler(scope, send, load_session(scope))
+    elif scope['type'] == 'lifespan':
+        # Nothing to set up; acknowledge startup/shutdown so servers don't warn
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                db_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    return await wsgi_application(scope, receive, send)
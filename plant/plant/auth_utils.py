@@ -0,0 +1,223 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict, deque
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from config import Config
+
+# Prefix used by werkzeug for PBKDF2 hashes ("pbkdf2:sha256:<iterations>$salt$hash")
+HASH_PREFIX = 'pbkdf2:'
+
+def hash_password(password, iterations):
+    """
+    Hash a password with a random salt using PBKDF2-SHA256.
+    """
+    return generate_password_hash(password, method=f'pbkdf2:sha256:{iterations}', salt_length=16)
+
+def is_hashed(stored):
+    """
+    Return True if the stored value is a salted hash rather than a legacy plaintext password.
+    """
+    return bool(stored) and stored.startswith(HASH_PREFIX) and '$' in stored
+
+def hash_iterations(stored):
+    """
+    Return the PBKDF2 iteration count encoded in a stored hash, or 0 if unknown.
+    """
+    try:
+        method = stored.split('$', 1)[0]
+        return int(method.split(':')[2])
+    except (IndexError, ValueError):
+        return 0
+
+def needs_rehash(stored, iterations):
+    """
+    Return True if the stored value is plaintext or was hashed with a different cost.
+    """
+    return not is_hashed(stored) or hash_iterations(stored) != iterations
+
+
+class VerificationCache:
+    """
+    Remember recent successful password checks so repeat logins skip the PBKDF2 work.
+
+    Entries are keyed by a digest of the stored hash and the candidate password,
+    so changing the password (or rehashing it) naturally invalidates the entry.
+    Only successes are cached; a wrong password always pays the full hashing cost.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(stored, password):
+        return hashlib.sha256(f"{stored}\0{password}".encode('utf-8')).digest()
+
+    def get(self, stored, password):
+        key = self._key(stored, password)
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, stored, password):
+        key = self._key(stored, password)
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SlidingWindowRateLimiter:
+    """
+    In-memory sliding-window limiter: at most `limit` hits per key within `window` seconds.
+
+    State is per process, so with several workers the effective limit is
+    `limit * workers`; set the limits accordingly. Keys whose hits have all
+    expired are swept once per window, and at most `max_keys` keys are kept
+    (the least recently hit are dropped first), so memory stays bounded even
+    when attempts are spread over many distinct emails.
+    """
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _prune(self, hits, now):
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+
+    def _sweep(self, now):
+        if now - self._last_sweep < self.window:
+            return
+        self._last_sweep = now
+        for key in list(self._hits):
+            hits = self._hits[key]
+            self._prune(hits, now)
+            if not hits:
+                del self._hits[key]
+
+    def is_limited(self, key):
+        """Return True if the key has already used up its window."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if not hits:
+                return False
+            self._prune(hits, now)
+            if not hits:
+                del self._hits[key]
+                return False
+            return len(hits) >= self.limit
+
+    def hit(self, key):
+        """Record one attempt for the key."""
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            else:
+                self._hits.move_to_end(key)
+            self._prune(hits, now)
+            hits.append(now)
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def retry_after(self, key):
+        """Seconds until the oldest hit for the key leaves the window."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if not hits:
+                return 0
+            return max(0, int(hits[0] + self.window - now) + 1)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._hits)
+
+
+_verification_cache = VerificationCache(Config.PASSWORD_CACHE_SIZE, Config.PASSWORD_CACHE_TTL)
+ip_limiter = SlidingWindowRateLimiter(Config.LOGIN_RATE_LIMIT_IP, Config.LOGIN_RATE_WINDOW, Config.LOGIN_RATE_MAX_KEYS)
+email_limiter = SlidingWindowRateLimiter(Config.LOGIN_RATE_LIMIT_EMAIL, Config.LOGIN_RATE_WINDOW, Config.LOGIN_RATE_MAX_KEYS)
+
+def verify_password(stored, password, use_cache=True):
+    """
+    Check a candidate password against a stored value.
+
+    Accepts both salted hashes and legacy plaintext rows so existing users
+    can still log in; callers should rehash on success (see needs_rehash).
+    """
+    if not stored or password is None:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+    if use_cache and _verification_cache.get(stored, password):
+        return True
+    ok = check_password_hash(stored, password)
+    if ok and use_cache:
+        _verification_cache.add(stored, password)
+    return ok
+
+def configure(app):
+    """
+    Apply cache and rate limit settings from the app config.
+    """
+    global _verification_cache, ip_limiter, email_limiter
+    _verification_cache = VerificationCache(
+        max_entries=app.config['PASSWORD_CACHE_SIZE'],
+        ttl=app.config['PASSWORD_CACHE_TTL']
+    )
+    window, max_keys = app.config['LOGIN_RATE_WINDOW'], app.config['LOGIN_RATE_MAX_KEYS']
+    ip_limiter = SlidingWindowRateLimiter(app.config['LOGIN_RATE_LIMIT_IP'], window, max_keys)
+    email_limiter = SlidingWindowRateLimiter(app.config['LOGIN_RATE_LIMIT_EMAIL'], window, max_keys)
+
+def benchmark_hashing(iterations_list=(100000, 200000, 300000, 600000), rounds=5):
+    """
+    Time one hash verification for each iteration count.
+
+    Returns a list of (iterations, milliseconds per verification).
+    """
+    results = []
+    for iterations in iterations_list:
+        stored = hash_password('benchmark-password', iterations)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            check_password_hash(stored, 'benchmark-password')
+        elapsed = (time.perf_counter() - start) / rounds
+        results.append((iterations, elapsed * 1000))
+    return results
+
+if __name__ == '__main__':
+    # Usage: python auth_utils.py [workers]
+    # Prints per-login hashing cost and the login throughput it allows for the given worker count.
+    import sys
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    print(f"{'iterations':>12} {'ms/verify':>10} {'logins/s':>10}  ({workers} workers)")
+    for iterations, ms in benchmark_hashing():
+        print(f"{iterations:>12} {ms:>10.1f} {workers * 1000 / ms:>10.0f}")
@@ -9,23 +9,58 @@ class Config:
     DEBUG = os.environ.get('FLASK_DEBUG', True)
     
     # Database Configuration
+    # 'mysql' (default) or 'sqlite' for an embedded database with no server (offline field stations)
+    DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql')
     MYSQL_HOST = os.environ.get('MYSQL_HOST', 'localhost')
     MYSQL_USER = os.environ.get('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', '')
     MYSQL_DB = os.environ.get('MYSQL_DB', 'plants_db')
+    # Pooled connections per process (default: ASYNC_DB_THREADS + WSGI_THREADS, at most 32);
+    # keep workers * pool size below the server's max_connections
+    MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 0))
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'plants.db'))
     
     # Upload Configuration
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+    # Image Analysis Configuration
+    ANALYSIS_TILE_SIZE = int(os.environ.get('ANALYSIS_TILE_SIZE', 512))  # tile edge in pixels
+    ANALYSIS_TILE_MIN_PIXELS = int(os.environ.get('ANALYSIS_TILE_MIN_PIXELS', 4000000))  # tile images larger than ~4MP
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 0)) or None  # threads shared by all tiled analyses in a process (default: CPU count)
+    # Largest image accepted, checked on the file header before decoding. A decoded image takes
+    # 3 bytes per pixel (150MB at the 50MP default) plus ~tile_size^2 * 5 bytes per worker when tiled;
+    # images below ANALYSIS_TILE_MIN_PIXELS are analyzed whole at ~8 bytes per pixel (~32MB at 4MP).
+    MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 50000000))
     
+    # Number of reverse proxies in front of the app (0 = none); used to read the client IP from X-Forwarded-For
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
     # Session Configuration
     PERMANENT_SESSION_LIFETIME = 86400 * 7  # 7 days
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
 
+    # Password Hashing Configuration
+    # PBKDF2 iterations; run `python auth_utils.py <workers>` to pick a cost for your hardware
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))
+    PASSWORD_CACHE_SIZE = int(os.environ.get('PASSWORD_CACHE_SIZE', 1024))
+    PASSWORD_CACHE_TTL = int(os.environ.get('PASSWORD_CACHE_TTL', 300))  # seconds
+
+    # Login Rate Limiting (per process, sliding window)
+    LOGIN_RATE_WINDOW = int(os.environ.get('LOGIN_RATE_WINDOW', 300))  # seconds
+    LOGIN_RATE_LIMIT_IP = int(os.environ.get('LOGIN_RATE_LIMIT_IP', 30))  # failed attempts per IP per window
+    LOGIN_RATE_LIMIT_EMAIL = int(os.environ.get('LOGIN_RATE_LIMIT_EMAIL', 5))  # failed attempts per email per window
+    LOGIN_RATE_MAX_KEYS = int(os.environ.get('LOGIN_RATE_MAX_KEYS', 10000))  # IPs/emails tracked per limiter
+
+    # Notification API
+    NOTIFICATION_READ_BATCH_MAX = 500  # max ids per batched mark-as-read request
+    ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 16))  # DB threads shared by async API handlers (asgi.py)
+    WSGI_THREADS = int(os.environ.get('WSGI_THREADS', 16))  # threads serving all other routes under asgi.py
+
     # Mail Configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
@@ -27,6 +27,7 @@ CREATE TABLE IF NOT EXISTS predictions (
     disease_name VARCHAR(100) NOT NULL,
     severity_score FLOAT NOT NULL DEFAULT 0,
     status ENUM('Healthy', 'Non-Critical', 'Critical') NOT NULL,
+    features VARBINARY(255) NULL,  -- packed color feature vector (see image_processor.FEATURE_NAMES)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     INDEX idx_user_id (user_id),
@@ -105,6 +106,10 @@ CREATE TABLE IF NOT EXISTS complaints (
 INSERT IGNORE INTO users (fullname, email, phone, password, role) 
 VALUES ('System Admin', 'admin@plant.com', '+1-555-0000', 'admin123', 'admin');
 
+-- Existing databases get the prediction feature vector column added automatically on the
+-- app's first connection (storage.MySQLBackend.migrate). To apply it by hand instead:
+-- ALTER TABLE predictions ADD COLUMN features VARBINARY(255) NULL AFTER status;
+
 -- Create Indexes for Better Performance
 CREATE INDEX idx_prediction_user ON predictions(user_id);
 CREATE INDEX idx_prediction_date ON predictions(created_at);
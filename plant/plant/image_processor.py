@@ -1,18 +1,242 @@
 import cv2
 import numpy as np
 import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
 
-def analyze_plant_health(image_path):
+from config import Config
+
+# Define color ranges for different disease indicators (HSV)
+DISEASE_COLOR_RANGES = [
+    # Yellow/Brown range (Leaf Spot, Mildew)
+    (np.array([15, 50, 50]), np.array([35, 255, 255])),
+    # Brown/Dark brown range (Blight, Rot)
+    (np.array([0, 20, 20]), np.array([15, 255, 200])),
+    # Red/Rust range (Rust diseases)
+    (np.array([0, 100, 100]), np.array([10, 255, 255])),
+]
+
+# Severity classes: (upper bound of severity %, status, disease name, advice); the last has no bound
+SEVERITY_LEVELS = [
+    (3, 'Healthy', 'No Disease Detected',
+     'Your plant appears to be healthy! Continue with regular care and monitoring.'),
+    (10, 'Non-Critical', 'Leaf Spot / Powdery Mildew',
+     'Minor infection detected. Recommended: Apply fungicide spray and improve air circulation.'),
+    (25, 'Non-Critical', 'Early Blight / Rust',
+     'Moderate infection detected. Remove affected leaves and apply appropriate treatment.'),
+    (None, 'Critical', 'Severe Blight / Rot',
+     'Critical infection detected! Immediate action needed: Isolate plant, remove affected parts, and apply strong fungicide.'),
+]
+
+# Feature vector layout: fraction of pixels in each disease range, in any range,
+# then normalized hue, saturation and value histograms
+HUE_BINS = 16
+SAT_BINS = 8
+VAL_BINS = 8
+FEATURE_NAMES = (
+    ['yellow_fraction', 'brown_fraction', 'red_fraction', 'disease_fraction']
+    + [f'hue_{i}' for i in range(HUE_BINS)]
+    + [f'sat_{i}' for i in range(SAT_BINS)]
+    + [f'val_{i}' for i in range(VAL_BINS)]
+)
+DISEASE_FRACTION = FEATURE_NAMES.index('disease_fraction')
+
+# Packed format: one version byte, the image's pixel count, then the per-feature pixel
+# counts, all little-endian uint32 (OpenCV won't decode images past 2^30 pixels anyway):
+# 1 + 4 + 36 * 4 = 149 bytes, well within predictions.features VARBINARY(255).
+# Storing counts rather than fractions lets unpack_features reproduce the fractions
+# analyze_plant_health classified exactly, so re-scoring with unchanged thresholds is a no-op.
+FEATURE_VERSION = 2
+FEATURE_DTYPE = np.dtype([('version', 'u1'), ('pixels', '<u4'), ('counts', '<u4', (len(FEATURE_NAMES),))])
+
+def pack_features(counts, total_pixels):
+    """
+    Pack pixel_stats() counts into bytes for the predictions.features column.
+    """
+    record = np.zeros((), dtype=FEATURE_DTYPE)
+    record['version'] = FEATURE_VERSION
+    record['pixels'] = total_pixels
+    record['counts'] = counts
+    return record.tobytes()
+
+def unpack_features(blobs):
+    """
+    Decode many packed feature vectors at once into an (n, len(FEATURE_NAMES)) float64 array of fractions.
+    """
+    records = np.frombuffer(b''.join(blobs), dtype=FEATURE_DTYPE)
+    if records.size and (records['version'] != FEATURE_VERSION).any():
+        raise ValueError('Unsupported feature vector version')
+    return records['counts'] / records['pixels'][:, np.newaxis].astype(np.float64)
+
+def image_dimensions(image_path):
+    """
+    Read (width, height) from a PNG, JPEG or GIF header without decoding the image.
+
+    Returns None if the format is not recognized.
+    """
+    with open(image_path, 'rb') as f:
+        head = f.read(26)
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if head[:2] != b'\xff\xd8':
+            return None
+
+        # JPEG: walk the marker segments up to the first start-of-frame
+        f.seek(2)
+        while True:
+            byte = f.read(1)
+            if not byte:
+                return None
+            if byte != b'\xff':
+                continue
+            marker = f.read(1)
+            while marker == b'\xff':
+                marker = f.read(1)
+            if not marker:
+                return None
+            code = marker[0]
+            if code == 0x01 or 0xD0 <= code <= 0xD9:
+                continue  # standalone markers carry no length
+            segment = f.read(2)
+            if len(segment) < 2:
+                return None
+            length = struct.unpack('>H', segment)[0]
+            if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                frame = f.read(5)
+                if len(frame) < 5:
+                    return None
+                height, width = struct.unpack('>HH', frame[1:5])
+                return width, height
+            f.seek(length - 2, os.SEEK_CUR)
+
+def pixel_stats(bgr):
+    """
+    Count disease and histogram pixels of a BGR image (or tile).
+
+    Returns an int64 array laid out like FEATURE_NAMES but holding pixel
+    counts, so stats from several tiles can simply be added together.
+    """
+    # Convert to HSV for better color detection
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+
+    # Create masks for each disease indicator and combine them
+    counts = []
+    mask = None
+    for lower, upper in DISEASE_COLOR_RANGES:
+        range_mask = cv2.inRange(hsv, lower, upper)
+        counts.append(cv2.countNonZero(range_mask))
+        mask = range_mask if mask is None else cv2.bitwise_or(mask, range_mask, dst=mask)
+    counts.append(cv2.countNonZero(mask))
+
+    hists = [
+        cv2.calcHist([hsv], [0], None, [HUE_BINS], [0, 180]),
+        cv2.calcHist([hsv], [1], None, [SAT_BINS], [0, 256]),
+        cv2.calcHist([hsv], [2], None, [VAL_BINS], [0, 256]),
+    ]
+    return np.concatenate([np.array(counts, dtype=np.int64)] + [h.ravel().astype(np.int64) for h in hists])
+
+def classify_severity(severity):
+    """
+    Map a diseased-pixel percentage to a status, disease name and advice.
+    """
+    # Calculate confidence (inverse of severity + base confidence)
+    confidence = round(max(0, 100 - (severity / 2)), 2)
+
+    # Classify based on severity
+    for bound, status, disease_name, message in SEVERITY_LEVELS:
+        if bound is None or severity < bound:
+            return {
+                'status': status,
+                'disease_name': disease_name,
+                'confidence': confidence,
+                'message': message
+            }
+
+# One pool shared by every tiled analysis in the process, so concurrent uploads
+# queue their tiles instead of each starting CPU-count threads
+_tile_pool = ThreadPoolExecutor(max_workers=Config.ANALYSIS_WORKERS or os.cpu_count(), thread_name_prefix='analysis-tile')
+
+def configure(app):
+    """
+    Size the shared tile pool from the app config (ANALYSIS_WORKERS).
+    """
+    global _tile_pool
+    old_pool = _tile_pool
+    _tile_pool = ThreadPoolExecutor(max_workers=app.config['ANALYSIS_WORKERS'] or os.cpu_count(),
+                                    thread_name_prefix='analysis-tile')
+    old_pool.shutdown(wait=False)
+
+def analyze_tiles(img, tile_size=512):
+    """
+    Count disease pixels tile by tile across the shared tile pool.
+
+    Tiles are views into the decoded image, so only the per-tile HSV and mask
+    buffers are allocated (about tile_size^2 * 5 bytes per worker) instead of
+    several full-size copies. OpenCV releases the GIL, so tiles run in parallel.
+
+    Returns (stats, heatmap): the summed pixel_stats() counts and a grid where
+    heatmap[row][col] is the percentage of diseased pixels in that tile.
+    """
+    height, width = img.shape[:2]
+    rows = range(0, height, tile_size)
+    cols = range(0, width, tile_size)
+
+    def work(origin):
+        y, x = origin
+        tile = img[y:y + tile_size, x:x + tile_size]
+        return pixel_stats(tile), tile.shape[0] * tile.shape[1]
+
+    origins = [(y, x) for y in rows for x in cols]
+    results = list(_tile_pool.map(work, origins))
+
+    heatmap = []
+    stats = np.zeros(len(FEATURE_NAMES), dtype=np.int64)
+    for r in range(len(rows)):
+        row = []
+        for c in range(len(cols)):
+            tile_stats, pixels = results[r * len(cols) + c]
+            stats += tile_stats
+            row.append(round(tile_stats[DISEASE_FRACTION] / pixels * 100, 2))
+        heatmap.append(row)
+    return stats, heatmap
+
+def analyze_plant_health(image_path, tile_size=None, tile_min_pixels=0, max_pixels=None):
     """
     Analyze plant health from an image using color analysis
-    
+
     Args:
         image_path: Path to the plant image
-        
+        tile_size: If set, analyze in tile_size x tile_size tiles (see analyze_tiles)
+        tile_min_pixels: Only use tiled analysis for images with at least this many pixels
+        max_pixels: Reject images larger than this (checked on the file header, before decoding)
+
     Returns:
-        Dictionary with analysis results
+        Dictionary with analysis results, including the packed color feature
+        vector under 'features' (see FEATURE_NAMES). Tiled analysis also
+        returns a per-tile severity 'heatmap' and the 'tile_size' used.
     """
     try:
+        # Check dimensions before decoding: a small compressed upload can expand
+        # to gigabytes of pixels
+        if max_pixels:
+            dimensions = image_dimensions(image_path)
+            if dimensions is None:
+                return {
+                    'status': 'Error',
+                    'disease_name': 'Invalid Image',
+                    'confidence': 0,
+                    'message': 'Unsupported image format. Please upload a PNG, JPEG or GIF image.'
+                }
+            if dimensions[0] * dimensions[1] > max_pixels:
+                return {
+                    'status': 'Error',
+                    'disease_name': 'Image Too Large',
+                    'confidence': 0,
+                    'message': f'Image is {dimensions[0]}x{dimensions[1]} pixels; the maximum is {max_pixels:,} pixels.'
+                }
+
         # Read image
         img = cv2.imread(image_path)
         if img is None:
@@ -22,7 +246,7 @@ def analyze_plant_health(image_path):
                 'confidence': 0,
                 'message': 'Could not read the image. Please check the file.'
             }
-        
+
         # Check image size
         if img.size == 0:
             return {
@@ -31,73 +255,29 @@ def analyze_plant_health(image_path):
                 'confidence': 0,
                 'message': 'Image appears to be empty or corrupted.'
             }
-        
-        # Convert to HSV for better color detection
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # Define color ranges for different disease indicators
-        # Yellow/Brown range (Leaf Spot, Mildew)
-        lower_yellow = np.array([15, 50, 50])
-        upper_yellow = np.array([35, 255, 255])
-        
-        # Brown/Dark brown range (Blight, Rot)
-        lower_brown = np.array([0, 20, 20])
-        upper_brown = np.array([15, 255, 200])
-        
-        # Red/Rust range (Rust diseases)
-        lower_red = np.array([0, 100, 100])
-        upper_red = np.array([10, 255, 255])
-        
-        # Create masks for each disease indicator
-        mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow)
-        mask_brown = cv2.inRange(hsv, lower_brown, upper_brown)
-        mask_red = cv2.inRange(hsv, lower_red, upper_red)
-        
-        # Combine masks
-        mask = mask_yellow + mask_brown + mask_red
-        
-        # Calculate disease percentage
+
         total_pixels = img.shape[0] * img.shape[1]
-        disease_pixels = cv2.countNonZero(mask)
-        severity = (disease_pixels / total_pixels) * 100 if total_pixels > 0 else 0
-        
-        # Calculate confidence (inverse of severity + base confidence)
-        confidence = round(max(0, 100 - (severity / 2)), 2)
-        
-        # Classify based on severity
-        if severity < 3:
-            return {
-                'status': 'Healthy',
-                'disease_name': 'No Disease Detected',
-                'confidence': confidence,
-                'message': 'Your plant appears to be healthy! Continue with regular care and monitoring.'
-            }
-        elif severity < 10:
-            return {
-                'status': 'Non-Critical',
-                'disease_name': 'Leaf Spot / Powdery Mildew',
-                'confidence': confidence,
-                'message': 'Minor infection detected. Recommended: Apply fungicide spray and improve air circulation.'
-            }
-        elif severity < 25:
-            return {
-                'status': 'Non-Critical',
-                'disease_name': 'Early Blight / Rust',
-                'confidence': confidence,
-                'message': 'Moderate infection detected. Remove affected leaves and apply appropriate treatment.'
-            }
+        heatmap = None
+        if tile_size and total_pixels >= tile_min_pixels:
+            stats, heatmap = analyze_tiles(img, tile_size)
         else:
-            return {
-                'status': 'Critical',
-                'disease_name': 'Severe Blight / Rot',
-                'confidence': confidence,
-                'message': 'Critical infection detected! Immediate action needed: Isolate plant, remove affected parts, and apply strong fungicide.'
-            }
-            
+            stats = pixel_stats(img)
+
+        # Calculate disease percentage
+        features = stats / total_pixels
+        severity = features[DISEASE_FRACTION] * 100
+
+        result = classify_severity(float(severity))
+        result['features'] = pack_features(stats, total_pixels)
+        if heatmap is not None:
+            result['heatmap'] = heatmap
+            result['tile_size'] = tile_size
+        return result
+
     except Exception as e:
         return {
             'status': 'Error',
             'disease_name': 'Processing Error',
             'confidence': 0,
             'message': f'Error analyzing image: {str(e)}'
-        }
\ No newline at end of file
+        }
@@ -107,6 +107,7 @@ CREATE TABLE IF NOT EXISTS `predictions` (
   `disease_name` varchar(100) COLLATE utf8mb4_unicode_ci NOT NULL,
   `severity_score` float NOT NULL DEFAULT '0',
   `status` enum('Healthy','Non-Critical','Critical') COLLATE utf8mb4_unicode_ci NOT NULL,
+  `features` varbinary(255) DEFAULT NULL,
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
   KEY `idx_user_id` (`user_id`),
@@ -0,0 +1,102 @@
+"""
+Re-score historical predictions from their stored feature vectors.
+
+Every prediction saved by /detect keeps a packed color feature vector
+(image_processor.FEATURE_NAMES). This job reclassifies them with new
+severity thresholds or a new scoring model without re-reading any images.
+Each batch is decoded and classified with vectorized NumPy.
+
+Usage:
+    python rescore.py                          # dry run with current thresholds
+    python rescore.py --thresholds 2,8,20      # try new class boundaries
+    python rescore.py --model mymodels:score   # score(features) -> severity % per row
+    python rescore.py --thresholds 2,8,20 --apply
+"""
+import argparse
+import importlib
+import time
+from collections import Counter
+import numpy as np
+
+from config import Config
+from image_processor import SEVERITY_LEVELS, DISEASE_FRACTION, unpack_features
+from storage import create_storage
+
+def default_score(features):
+    """Severity % as computed by analyze_plant_health: share of pixels in any disease range."""
+    return features[:, DISEASE_FRACTION] * 100
+
+def classify_many(severity, thresholds=None):
+    """
+    Vectorized classify_severity: returns (status, disease_name, confidence) arrays.
+
+    thresholds optionally replaces the SEVERITY_LEVELS bounds (one per bounded level).
+    """
+    bounds = [level[0] for level in SEVERITY_LEVELS if level[0] is not None]
+    if thresholds is not None:
+        if len(thresholds) != len(bounds):
+            raise ValueError(f"Expected {len(bounds)} thresholds, got {len(thresholds)}")
+        bounds = sorted(thresholds)
+    statuses = np.array([level[1] for level in SEVERITY_LEVELS], dtype=object)
+    names = np.array([level[2] for level in SEVERITY_LEVELS], dtype=object)
+
+    # severity < bound selects that level, matching classify_severity
+    index = np.searchsorted(np.array(bounds, dtype=np.float64), severity, side='right')
+    confidence = np.round(np.maximum(0, 100 - severity / 2), 2)
+    return statuses[index], names[index], confidence
+
+def rescore(storage, thresholds=None, score=default_score, apply=False, batch_size=100000):
+    """
+    Reclassify all predictions with features. Only rows whose result changes are written
+    (and only when apply is True). Returns a summary dict.
+    """
+    total = changed = 0
+    before, after = Counter(), Counter()
+    for rows in storage.predictions.iter_features(batch_size=batch_size):
+        features = unpack_features([bytes(r['features']) for r in rows])
+        status, names, confidence = classify_many(score(features), thresholds)
+
+        old_status = np.array([r['status'] for r in rows], dtype=object)
+        old_names = np.array([r['disease_name'] for r in rows], dtype=object)
+        old_score = np.array([r['severity_score'] for r in rows], dtype=np.float64)
+        diff = (status != old_status) | (names != old_names) | (np.abs(confidence - old_score) > 0.01)
+
+        total += len(rows)
+        changed += int(diff.sum())
+        before.update(old_status)
+        after.update(status)
+
+        if apply and diff.any():
+            ids = np.array([r['id'] for r in rows])
+            storage.predictions.update_scores([
+                (status[i], names[i], float(confidence[i]), int(ids[i]))
+                for i in np.flatnonzero(diff)
+            ])
+    return {'total': total, 'changed': changed, 'before': dict(before), 'after': dict(after)}
+
+def load_model(spec):
+    """Load a 'module:function' scoring callable."""
+    module_name, func_name = spec.split(':', 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-score stored predictions from their feature vectors')
+    parser.add_argument('--thresholds', help='comma-separated severity %% bounds, e.g. 3,10,25')
+    parser.add_argument('--model', help="scoring function as 'module:function', returns severity %% per row")
+    parser.add_argument('--batch-size', type=int, default=100000)
+    parser.add_argument('--apply', action='store_true', help='write changed results (default: dry run)')
+    args = parser.parse_args()
+
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    thresholds = [float(t) for t in args.thresholds.split(',')] if args.thresholds else None
+    score = load_model(args.model) if args.model else default_score
+
+    start = time.perf_counter()
+    summary = rescore(create_storage(config), thresholds, score, args.apply, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    print(f"Predictions with features: {summary['total']}")
+    print(f"Changed: {summary['changed']} ({'written' if args.apply else 'dry run'})")
+    for status in sorted(set(summary['before']) | set(summary['after'])):
+        print(f"  {status:<14} {summary['before'].get(status, 0):>10} -> {summary['after'].get(status, 0):>10}")
+    print(f"Done in {elapsed:.1f}s")
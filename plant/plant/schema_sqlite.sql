@@ -0,0 +1,91 @@
+-- Plant Disease Detection Database Schema (SQLite)
+-- Embedded equivalent of database.sql for offline field stations and local runs.
+-- Applied automatically by SQLiteBackend when DB_BACKEND=sqlite.
+-- Timestamps are stored in local time like MySQL's CURRENT_TIMESTAMP (SQLite's is UTC).
+
+-- Users Table
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fullname VARCHAR(100) NOT NULL,
+    email VARCHAR(100) NOT NULL UNIQUE COLLATE NOCASE,
+    phone VARCHAR(20) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    role TEXT DEFAULT 'user' CHECK (role IN ('user', 'admin')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
+
+-- Predictions Table (Detection Results)
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    image_path VARCHAR(255) NOT NULL,
+    plant_type VARCHAR(50),
+    disease_name VARCHAR(100) NOT NULL,
+    severity_score FLOAT NOT NULL DEFAULT 0,
+    status TEXT NOT NULL CHECK (status IN ('Healthy', 'Non-Critical', 'Critical')),
+    features BLOB,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_user_id ON predictions(user_id);
+CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions(created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_status ON predictions(status);
+
+-- Alerts Table (Disease Alerts to Users)
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    priority TEXT NOT NULL DEFAULT 'General' CHECK (priority IN ('High', 'Medium', 'General')),
+    disease_name VARCHAR(100) NOT NULL,
+    region VARCHAR(100) NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_created_at ON alerts(created_at);
+
+-- User Specific Alerts Mapping
+CREATE TABLE IF NOT EXISTS user_alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    alert_id INTEGER NOT NULL REFERENCES alerts(id) ON DELETE CASCADE,
+    is_read BOOLEAN DEFAULT FALSE,
+    notified_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    read_at TIMESTAMP NULL
+);
+CREATE INDEX IF NOT EXISTS idx_user_alerts_user_id ON user_alerts(user_id);
+CREATE INDEX IF NOT EXISTS idx_user_alerts_alert_id ON user_alerts(alert_id);
+
+-- Notifications Table (System Notifications)
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    type VARCHAR(50) NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    icon VARCHAR(50),
+    related_alert_id INTEGER REFERENCES alerts(id) ON DELETE SET NULL,
+    related_prediction_id INTEGER REFERENCES predictions(id) ON DELETE SET NULL,
+    is_read BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    read_at TIMESTAMP NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id, is_read);
+CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications(created_at);
+
+-- Complaints/Support Table
+CREATE TABLE IF NOT EXISTS complaints (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    category VARCHAR(50),
+    subject VARCHAR(255) NOT NULL,
+    message TEXT NOT NULL,
+    status TEXT DEFAULT 'Open' CHECK (status IN ('Open', 'In Progress', 'Resolved')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    resolved_at TIMESTAMP NULL
+);
+
+-- Insert Admin Account (Default: Email: admin@plant.com, Password: admin123)
+-- Stored as plaintext like database.sql; it is rehashed on first login.
+INSERT OR IGNORE INTO users (fullname, email, phone, password, role)
+VALUES ('System Admin', 'admin@plant.com', '+1-555-0000', 'admin123', 'admin');
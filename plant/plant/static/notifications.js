@@ -14,7 +14,10 @@
     }
 
     // Notification Polling - Check for new notifications every 5 seconds
-    let lastNotificationId = localStorage.getItem('lastNotificationId') || 0;
+    // Only notifications newer than the last one seen are requested (?since_id=),
+    // and the ETag lets the server answer unchanged polls with an empty 304.
+    let lastNotificationId = parseInt(localStorage.getItem('lastNotificationId'), 10) || 0;
+    let lastEtag = null;
     
     function pollNotifications() {
         if (!('Notification' in window)) {
@@ -27,35 +30,31 @@
             return;
         }
 
-        // Check for unread notifications
-        fetch('/api/notifications/unread')
-            .then(r => r.json())
-            .then(data => {
-                console.log('[PlantCare] Unread count:', data.count);
-                if (data.count > 0) {
-                    // Fetch recent notifications
-                    fetch('/api/notifications/list')
-                        .then(r => r.json())
-                        .then(notifData => {
-                            console.log('[PlantCare] Fetched notifications:', notifData.notifications ? notifData.notifications.length : 0);
-                            if (notifData.success && notifData.notifications && notifData.notifications.length > 0) {
-                                // Process notifications
-                                notifData.notifications.forEach(notif => {
-                                    console.log('[PlantCare] Checking notif ID:', notif.id, 'last:', lastNotificationId, 'read:', notif.is_read);
-                                    // Only show if newer than the last shown notification and not read
-                                    if (notif.id > lastNotificationId && !notif.is_read) {
-                                        console.log('[PlantCare] Showing notification:', notif.title);
-                                        showBrowserNotification(notif);
-                                        lastNotificationId = notif.id;
-                                        localStorage.setItem('lastNotificationId', lastNotificationId);
-                                    }
-                                });
-                            }
-                        })
-                        .catch(e => console.error('[PlantCare] List fetch error:', e));
+        const headers = lastEtag ? { 'If-None-Match': lastEtag } : {};
+        fetch('/api/notifications/list?since_id=' + lastNotificationId, { headers: headers, cache: 'no-store' })
+            .then(r => {
+                if (r.status === 304) {
+                    return null;
                 }
+                lastEtag = r.headers.get('ETag');
+                return r.json();
             })
-            .catch(e => console.error('[PlantCare] Unread fetch error:', e));
+            .then(notifData => {
+                if (!notifData || !notifData.success || !notifData.notifications) {
+                    return;
+                }
+                console.log('[PlantCare] New notifications:', notifData.notifications.length);
+                // Oldest first so they pop up in the order they were created
+                notifData.notifications.slice().reverse().forEach(notif => {
+                    if (notif.id > lastNotificationId && !notif.is_read) {
+                        console.log('[PlantCare] Showing notification:', notif.title);
+                        showBrowserNotification(notif);
+                    }
+                    lastNotificationId = Math.max(lastNotificationId, notif.id);
+                });
+                localStorage.setItem('lastNotificationId', lastNotificationId);
+            })
+            .catch(e => console.error('[PlantCare] List fetch error:', e));
     }
 
     function showBrowserNotification(notification) {
@@ -0,0 +1,518 @@
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import mysql.connector
+    import mysql.connector.pooling
+except ImportError:  # SQLite-only installs (field stations) don't need the MySQL driver
+    mysql = None
+
+logger = logging.getLogger(__name__)
+
+# Parse TIMESTAMP columns back into datetime objects so templates can call strftime()
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+
+class DuplicateError(Exception):
+    """Raised when an insert violates a unique constraint (e.g. an existing email)."""
+
+
+class Transaction:
+    """
+    Thin wrapper around a DB-API cursor that returns rows as dicts and
+    translates the %s placeholders used in queries to the backend's style.
+    """
+
+    def __init__(self, backend, cursor):
+        self.backend = backend
+        self.cursor = cursor
+
+    def execute(self, query, params=()):
+        self.cursor.execute(self.backend.sql(query), params)
+        return self.cursor
+
+    def executemany(self, query, seq_of_params):
+        self.cursor.executemany(self.backend.sql(query), seq_of_params)
+        return self.cursor
+
+    def fetchone(self, query, params=()):
+        return self.execute(query, params).fetchone()
+
+    def fetchall(self, query, params=()):
+        return self.execute(query, params).fetchall()
+
+    def scalar(self, query, params=()):
+        row = self.fetchone(query, params)
+        return next(iter(row.values())) if row else None
+
+
+class Backend:
+    """
+    Base class for database backends.
+    """
+    placeholder = '%s'
+    integrity_errors = ()
+    # Whether executemany() runs UPDATEs without a round trip per row
+    batches_updates = True
+
+    def connect(self):
+        raise NotImplementedError
+
+    def release(self, conn):
+        conn.close()
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    def sql(self, query):
+        return query if self.placeholder == '%s' else query.replace('%s', self.placeholder)
+
+    @contextmanager
+    def transaction(self):
+        """Run the block in one transaction; commit on success, roll back on error."""
+        conn = self.connect()
+        cursor = self.cursor(conn)
+        try:
+            yield Transaction(self, cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            self.release(conn)
+
+
+class MySQLBackend(Backend):
+    """
+    MySQL / MariaDB backend using a mysql.connector connection pool.
+
+    The pool is opened on first use, so the app still starts while the server is down.
+    Transactions beyond pool_size get a one-off connection instead of failing.
+    """
+
+    def __init__(self, host, user, password, database, pool_size=32):
+        if mysql is None:
+            raise RuntimeError('mysql-connector-python is required for DB_BACKEND=mysql')
+        self.params = {'host': host, 'user': user, 'password': password, 'database': database}
+        # mysql.connector only rewrites INSERT/REPLACE executemany() into one statement
+        self.batches_updates = False
+        self.pool_size = max(1, min(pool_size, mysql.connector.pooling.CNX_POOL_MAXSIZE))
+        self.integrity_errors = (mysql.connector.IntegrityError,)
+        self._pool = None
+        self._migrated = False
+        self._lock = threading.Lock()
+        try:
+            self.release(self.connect())
+        except mysql.connector.Error as e:
+            # Like any other database outage, this fails requests rather than startup
+            logger.warning(f"MySQL unavailable at startup ({e}); schema check will run on first connection")
+
+    def migrate(self, conn):
+        """
+        Add columns introduced after database.sql was first applied.
+
+        Runs on the first successful connection. Raises RuntimeError if the schema can't
+        be checked or upgraded (e.g. no ALTER privilege) rather than letting every insert
+        into the new columns fail later; connection errors propagate unchanged.
+        """
+        alter = "ALTER TABLE predictions ADD COLUMN features VARBINARY(255) NULL AFTER status"
+        cursor = self.cursor(conn)
+        try:
+            tx = Transaction(self, cursor)
+            exists = tx.scalar("""
+                SELECT COUNT(*) AS c FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA=%s AND TABLE_NAME='predictions' AND COLUMN_NAME='features'
+            """, (self.params['database'],))
+            if not exists:
+                logger.info("Adding predictions.features column")
+                tx.execute(alter)
+            conn.commit()
+        except mysql.connector.Error as e:
+            if e.errno and 2000 <= e.errno < 3000:
+                raise  # client-side (connection) error: retried on the next connection
+            raise RuntimeError(f"Could not upgrade the MySQL schema ({e}); run manually: {alter};") from e
+        finally:
+            cursor.close()
+        self._migrated = True
+
+    def connect(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # transaction() always ends in commit or rollback and no session state is set,
+                    # so skip the per-checkout session reset (several extra round trips)
+                    self._pool = mysql.connector.pooling.MySQLConnectionPool(
+                        pool_name='plantguard', pool_size=self.pool_size, pool_reset_session=False, **self.params)
+        try:
+            conn = self._pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            conn = mysql.connector.connect(**self.params)
+        if not self._migrated:
+            with self._lock:
+                try:
+                    if not self._migrated:
+                        self.migrate(conn)
+                except Exception:
+                    self.release(conn)
+                    raise
+        return conn
+
+    def cursor(self, conn):
+        return conn.cursor(dictionary=True)
+
+
+def _dict_factory(cursor, row):
+    return {col[0]: row[i] for i, col in enumerate(cursor.description)}
+
+
+class SQLiteBackend(Backend):
+    """
+    Embedded SQLite backend in WAL mode, so readers don't block the writer.
+
+    Each thread keeps one open connection; the schema is created on first use.
+    """
+    placeholder = '?'
+    integrity_errors = (sqlite3.IntegrityError,)
+
+    def __init__(self, path, schema_path=None):
+        self.path = path
+        self._local = threading.local()
+        schema_path = schema_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema_sqlite.sql')
+        conn = self.connect()
+        with open(schema_path, encoding='utf-8') as f:
+            conn.executescript(f.read())
+        # Databases created before the features column existed
+        columns = [row['name'] for row in conn.execute('PRAGMA table_info(predictions)')]
+        if 'features' not in columns:
+            conn.execute('ALTER TABLE predictions ADD COLUMN features BLOB')
+        conn.commit()
+
+    def sql(self, query):
+        # SQLite's CURRENT_TIMESTAMP is UTC; store local time, as MySQL does
+        return super().sql(query).replace('CURRENT_TIMESTAMP', "datetime('now', 'localtime')")
+
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, timeout=10)
+            conn.row_factory = _dict_factory
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def release(self, conn):
+        # Keep the per-thread connection open for reuse
+        pass
+
+
+class UserRepository:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_by_email(self, email, role=None):
+        with self.backend.transaction() as tx:
+            if role:
+                return tx.fetchone("SELECT * FROM users WHERE email=%s AND role=%s", (email, role))
+            return tx.fetchone("SELECT * FROM users WHERE email=%s", (email,))
+
+    def create(self, fullname, email, phone, password_hash):
+        """Insert a user and return the new id; raises DuplicateError if the email exists."""
+        try:
+            with self.backend.transaction() as tx:
+                cursor = tx.execute("INSERT INTO users (fullname, email, phone, password) VALUES (%s, %s, %s, %s)",
+                                    (fullname, email, phone, password_hash))
+                return cursor.lastrowid
+        except self.backend.integrity_errors as err:
+            raise DuplicateError(str(err)) from err
+
+    def update_password(self, user_id, password_hash):
+        with self.backend.transaction() as tx:
+            tx.execute("UPDATE users SET password=%s WHERE id=%s", (password_hash, user_id))
+
+    def count(self, role='user'):
+        with self.backend.transaction() as tx:
+            return tx.scalar("SELECT COUNT(*) as c FROM users WHERE role=%s", (role,))
+
+    def list_by_role(self, role='user'):
+        """Return id, fullname and email for every user with the given role, ordered by name."""
+        with self.backend.transaction() as tx:
+            return tx.fetchall("SELECT id, fullname, email FROM users WHERE role=%s ORDER BY fullname", (role,))
+
+    def get_many(self, user_ids):
+        """Return id and email for the given user ids (unknown ids are skipped)."""
+        if not user_ids:
+            return []
+        placeholders = ','.join(['%s'] * len(user_ids))
+        with self.backend.transaction() as tx:
+            return tx.fetchall(f"SELECT id, email FROM users WHERE id IN ({placeholders})", tuple(user_ids))
+
+
+class PredictionRepository:
+    # Everything except the packed features blob, which is only read by iter_features
+    COLUMNS = "id, user_id, image_path, plant_type, disease_name, severity_score, status, created_at"
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def add(self, user_id, image_path, plant_type, disease_name, status, severity_score, features=None):
+        with self.backend.transaction() as tx:
+            cursor = tx.execute("INSERT INTO predictions (user_id, image_path, plant_type, disease_name, status, severity_score, features) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                                (user_id, image_path, plant_type, disease_name, status, severity_score, features))
+            return cursor.lastrowid
+
+    def iter_features(self, batch_size=100000, after_id=0):
+        """
+        Yield batches of rows (id, status, disease_name, severity_score, features)
+        for predictions that have a stored feature vector.
+
+        Uses keyset pagination on id, so each batch is one indexed range scan.
+        """
+        while True:
+            with self.backend.transaction() as tx:
+                rows = tx.fetchall("""
+                    SELECT id, status, disease_name, severity_score, features FROM predictions
+                    WHERE id>%s AND features IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (after_id, batch_size))
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1]['id']
+
+    def update_scores(self, rows, chunk_size=10000):
+        """
+        Bulk update (status, disease_name, severity_score, id) tuples in one transaction.
+
+        Where executemany() would send one UPDATE per row (MySQL), each chunk is staged
+        in a temporary table with one multi-row INSERT and applied with one joined UPDATE.
+        """
+        if not rows:
+            return
+        with self.backend.transaction() as tx:
+            if self.backend.batches_updates:
+                tx.executemany("UPDATE predictions SET status=%s, disease_name=%s, severity_score=%s WHERE id=%s", rows)
+                return
+            tx.execute("DROP TEMPORARY TABLE IF EXISTS rescored")
+            tx.execute("""
+                CREATE TEMPORARY TABLE rescored (
+                    id INT PRIMARY KEY,
+                    status VARCHAR(20) NOT NULL,
+                    disease_name VARCHAR(100) NOT NULL,
+                    severity_score FLOAT NOT NULL
+                ) ENGINE=MEMORY
+            """)
+            for start in range(0, len(rows), chunk_size):
+                tx.executemany("INSERT INTO rescored (status, disease_name, severity_score, id) VALUES (%s, %s, %s, %s)",
+                               rows[start:start + chunk_size])
+                tx.execute("""
+                    UPDATE predictions JOIN rescored USING (id)
+                    SET predictions.status=rescored.status, predictions.disease_name=rescored.disease_name,
+                        predictions.severity_score=rescored.severity_score
+                """)
+                tx.execute("DELETE FROM rescored")
+            tx.execute("DROP TEMPORARY TABLE rescored")
+
+    def for_user(self, user_id):
+        with self.backend.transaction() as tx:
+            return tx.fetchall(f"SELECT {self.COLUMNS} FROM predictions WHERE user_id=%s ORDER BY created_at DESC", (user_id,))
+
+    def count(self):
+        with self.backend.transaction() as tx:
+            return tx.scalar("SELECT COUNT(*) as c FROM predictions")
+
+    def recent_with_users(self, limit=None, status=None):
+        """Predictions joined with the owner's fullname and email, newest first."""
+        columns = ', '.join(f"p.{column}" for column in self.COLUMNS.split(', '))
+        query = f"""
+            SELECT {columns}, u.fullname, u.email
+            FROM predictions p
+            JOIN users u ON p.user_id=u.id
+        """
+        params = []
+        if status:
+            query += " WHERE p.status = %s"
+            params.append(status)
+        query += " ORDER BY p.created_at DESC"
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        with self.backend.transaction() as tx:
+            return tx.fetchall(query, tuple(params))
+
+
+class AlertRepository:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, priority, disease_name, region, message):
+        with self.backend.transaction() as tx:
+            cursor = tx.execute("INSERT INTO alerts (priority, disease_name, region, message) VALUES (%s, %s, %s, %s)",
+                                (priority, disease_name, region, message))
+            return cursor.lastrowid
+
+    def count(self):
+        with self.backend.transaction() as tx:
+            return tx.scalar("SELECT COUNT(*) as c FROM alerts")
+
+    def all(self):
+        with self.backend.transaction() as tx:
+            return tx.fetchall("SELECT * FROM alerts ORDER BY created_at DESC")
+
+    def for_user(self, user_id, limit=20):
+        """Latest alerts with this user's read state (if the alert was sent to them)."""
+        with self.backend.transaction() as tx:
+            return tx.fetchall("""
+                SELECT a.*, ua.id as user_alert_id, ua.is_read
+                FROM alerts a
+                LEFT JOIN user_alerts ua ON a.id = ua.alert_id AND ua.user_id=%s
+                ORDER BY a.created_at DESC LIMIT %s
+            """, (user_id, limit))
+
+    def deliver(self, alert_id, user_ids, title, message):
+        """
+        Link an alert to users and create their notifications in one transaction.
+
+        Returns the number of notifications created.
+        """
+        if not user_ids:
+            return 0
+        with self.backend.transaction() as tx:
+            tx.executemany("""
+                INSERT INTO user_alerts (user_id, alert_id, is_read, notified_at)
+                VALUES (%s, %s, FALSE, CURRENT_TIMESTAMP)
+            """, [(uid, alert_id) for uid in user_ids])
+            tx.executemany("""
+                INSERT INTO notifications (user_id, type, title, message, related_alert_id, is_read)
+                VALUES (%s, %s, %s, %s, %s, FALSE)
+            """, [(uid, 'alert', title, message, alert_id) for uid in user_ids])
+        return len(user_ids)
+
+
+class NotificationRepository:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def list_for_user(self, user_id, limit=50):
+        with self.backend.transaction() as tx:
+            return tx.fetchall("""
+                SELECT * FROM notifications
+                WHERE user_id=%s
+                ORDER BY created_at DESC
+                LIMIT %s
+            """, (user_id, limit))
+
+    def unread_count(self, user_id):
+        with self.backend.transaction() as tx:
+            return tx.scalar("SELECT COUNT(*) as count FROM notifications WHERE user_id=%s AND is_read=FALSE", (user_id,))
+
+    def mark_read(self, notif_id, user_id):
+        with self.backend.transaction() as tx:
+            cursor = tx.execute("UPDATE notifications SET is_read=TRUE, read_at=CURRENT_TIMESTAMP WHERE id=%s AND user_id=%s",
+                                (notif_id, user_id))
+            return cursor.rowcount
+
+    def poll(self, user_id, since_id=None, limit=50):
+        """
+        Return (latest_id, unread_count, notifications) for a user in one query.
+
+        notifications are the newest ones, or only those newer than since_id.
+        Any new notification or read-state change alters (latest_id, unread_count),
+        so the pair is used to build ETags for the list API.
+        """
+        if since_id is None:
+            where, order, params = "", "n.created_at DESC, n.id DESC", (user_id, user_id, limit)
+        else:
+            where, order, params = " AND id>%s", "n.id DESC", (user_id, user_id, since_id, limit)
+        with self.backend.transaction() as tx:
+            rows = tx.fetchall(f"""
+                SELECT s.latest_id, s.unread, n.*
+                FROM (
+                    SELECT COALESCE(MAX(id), 0) as latest_id,
+                           COALESCE(SUM(CASE WHEN is_read=FALSE THEN 1 ELSE 0 END), 0) as unread
+                    FROM notifications WHERE user_id=%s
+                ) s
+                LEFT JOIN (
+                    SELECT * FROM notifications
+                    WHERE user_id=%s{where}
+                    ORDER BY {order.replace('n.', '')}
+                    LIMIT %s
+                ) n ON 1=1
+                ORDER BY {order}
+            """, params)
+        # The state row is always present; without notifications its n.* columns are NULL
+        latest_id, unread = int(rows[0].pop('latest_id')), int(rows[0].pop('unread'))
+        for row in rows[1:]:
+            del row['latest_id'], row['unread']
+        notifications = [row for row in rows if row['id'] is not None]
+        return latest_id, unread, notifications
+
+    def mark_read_many(self, user_id, ids=None, up_to_id=None):
+        """
+        Mark several notifications as read with a single UPDATE.
+
+        Pass either a list of ids or up_to_id to mark everything with id <= up_to_id (not both).
+        Returns the number of rows changed.
+        """
+        if ids and up_to_id is not None:
+            raise ValueError('Pass ids or up_to_id, not both')
+        query = "UPDATE notifications SET is_read=TRUE, read_at=CURRENT_TIMESTAMP WHERE user_id=%s AND is_read=FALSE"
+        params = [user_id]
+        if ids:
+            query += f" AND id IN ({','.join(['%s'] * len(ids))})"
+            params.extend(ids)
+        elif up_to_id is not None:
+            query += " AND id<=%s"
+            params.append(up_to_id)
+        else:
+            return 0
+        with self.backend.transaction() as tx:
+            return tx.execute(query, tuple(params)).rowcount
+
+    def create(self, user_id, type, title, message, related_alert_id=None):
+        with self.backend.transaction() as tx:
+            cursor = tx.execute("""
+                INSERT INTO notifications (user_id, type, title, message, related_alert_id, is_read)
+                VALUES (%s, %s, %s, %s, %s, FALSE)
+            """, (user_id, type, title, message, related_alert_id))
+            return cursor.lastrowid
+
+
+class Storage:
+    """
+    Entry point for all data access: one repository per table group over a shared backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.users = UserRepository(backend)
+        self.predictions = PredictionRepository(backend)
+        self.alerts = AlertRepository(backend)
+        self.notifications = NotificationRepository(backend)
+
+
+def create_storage(config):
+    """
+    Build a Storage from app config (DB_BACKEND is 'mysql' or 'sqlite').
+    """
+    backend_name = config.get('DB_BACKEND', 'mysql').lower()
+    if backend_name == 'sqlite':
+        backend = SQLiteBackend(config['SQLITE_PATH'])
+    elif backend_name == 'mysql':
+        backend = MySQLBackend(
+            host=config['MYSQL_HOST'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            database=config['MYSQL_DB'],
+            pool_size=config.get('MYSQL_POOL_SIZE') or config['ASYNC_DB_THREADS'] + config['WSGI_THREADS']
+        )
+    else:
+        raise ValueError(f"Unknown DB_BACKEND: {backend_name}")
+    return Storage(backend)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+import pytest
+
+# Tests import the app modules directly, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run the app against a throwaway embedded SQLite database with cheap password hashing.
+# These must be set before config.py is imported.
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='plantguard-tests-'), 'plants.db')
+os.environ['PASSWORD_HASH_ITERATIONS'] = '1000'
+
+
+@pytest.fixture
+def app():
+    from app import app
+    app.config['TESTING'] = True
+    return app
+
+
+# BGR colors: a healthy leaf green and a brown inside image_processor's blight/rot range
+GREEN = (0, 120, 0)
+BROWN = (20, 60, 120)
+
+_user_counter = iter(range(1, 1000000))
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as a freshly created user."""
+    client = app.test_client()
+    email = f'user{next(_user_counter)}@example.com'
+    client.post('/signup', json={'fullname': 'Test User', 'email': email, 'phone': '1', 'password': 'pw'})
+    response = client.post('/login', json={'email': email, 'password': 'pw'})
+    assert response.json['success']
+    return client
+
+
+@pytest.fixture
+def asgi_get(client):
+    """GET a path through asgi.application with the client's session; returns (status, headers, body)."""
+    import asgi
+
+    def get(path, query_string=b'', headers=()):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        cookie = f"session={client.get_cookie('session').value}".encode('latin-1')
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query_string,
+                 'headers': [(b'cookie', cookie)] + list(headers)}
+        asyncio.run(asgi.application(scope, receive, send))
+        body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+        return messages[0]['status'], dict(messages[0]['headers']), json.loads(body) if body else None
+
+    return get
+
+
+@pytest.fixture
+def make_leaf():
+    """
+    Build a green BGR leaf image with brown (diseased) pixels: the first diseased_pixels
+    in row-major order, plus any (y0, y1, x0, x1) rectangles in patches.
+    """
+    def make(width=100, height=100, diseased_pixels=0, patches=()):
+        img = np.empty((height, width, 3), np.uint8)
+        img[:, :] = GREEN
+        img.reshape(-1, 3)[:diseased_pixels] = BROWN
+        for y0, y1, x0, x1 in patches:
+            img[y0:y1, x0:x1] = BROWN
+        return img
+
+    return make
+
+
+@pytest.fixture
+def leaf_file(tmp_path, make_leaf):
+    """Write a make_leaf() image under tmp_path (format from the name) and return its path."""
+    def write(name='leaf.png', **kwargs):
+        path = str(tmp_path / name)
+        assert cv2.imwrite(path, make_leaf(**kwargs))
+        return path
+
+    return write
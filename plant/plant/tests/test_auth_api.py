@@ -0,0 +1,63 @@
+import pytest
+
+import auth_utils
+from app import db
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(app):
+    """Start each test with empty login rate limiters."""
+    auth_utils.configure(app)
+
+
+def signup(client, email, password='pw'):
+    response = client.post('/signup', json={'fullname': 'Test User', 'email': email, 'phone': '1', 'password': password})
+    assert response.json['success']
+
+
+def login(client, email, password):
+    return client.post('/login', json={'email': email, 'password': password})
+
+
+def test_admin_login_rehashes_plaintext_password(app):
+    admin = db.users.get_by_email('admin@plant.com', role='admin')
+    db.users.update_password(admin['id'], 'admin123')
+
+    response = app.test_client().post('/admin/login', json={'email': 'admin@plant.com', 'password': 'admin123'})
+
+    assert response.json['success']
+    stored = db.users.get_by_email('admin@plant.com', role='admin')['password']
+    assert auth_utils.is_hashed(stored)
+    assert auth_utils.hash_iterations(stored) == app.config['PASSWORD_HASH_ITERATIONS']
+    assert auth_utils.verify_password(stored, 'admin123', use_cache=False)
+
+
+def test_login_is_rate_limited_per_email(app):
+    client = app.test_client()
+    signup(client, 'limited@example.com')
+
+    for _ in range(app.config['LOGIN_RATE_LIMIT_EMAIL']):
+        response = login(client, 'limited@example.com', 'wrong')
+        assert response.status_code == 200
+        assert not response.json['success']
+
+    response = login(client, 'limited@example.com', 'pw')
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= app.config['LOGIN_RATE_WINDOW'] + 1
+
+
+def test_successful_login_resets_email_counter(app):
+    client = app.test_client()
+    signup(client, 'reset@example.com')
+    failures = app.config['LOGIN_RATE_LIMIT_EMAIL'] - 1
+
+    for _ in range(failures):
+        assert not login(client, 'reset@example.com', 'wrong').json['success']
+    assert login(client, 'reset@example.com', 'pw').json['success']
+
+    # Without the reset, the first of these would have tipped the email over the limit
+    for _ in range(failures):
+        assert not login(client, 'reset@example.com', 'wrong').json['success']
+    response = login(client, 'reset@example.com', 'pw')
+    assert response.status_code == 200
+    assert response.json['success']
@@ -0,0 +1,108 @@
+import pytest
+
+import auth_utils
+from auth_utils import SlidingWindowRateLimiter, VerificationCache
+
+
+class FakeTime:
+    """Stand-in for the time module with a manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(auth_utils, 'time', fake)
+    return fake
+
+
+def test_hash_password_round_trip():
+    stored = auth_utils.hash_password('s3cret', 1000)
+    assert auth_utils.is_hashed(stored)
+    assert auth_utils.hash_iterations(stored) == 1000
+    assert auth_utils.verify_password(stored, 's3cret', use_cache=False)
+    assert not auth_utils.verify_password(stored, 'wrong', use_cache=False)
+
+
+def test_verify_password_accepts_legacy_plaintext():
+    assert auth_utils.verify_password('admin123', 'admin123')
+    assert not auth_utils.verify_password('admin123', 'admin12')
+    assert not auth_utils.verify_password('', '')
+    assert not auth_utils.verify_password('admin123', None)
+
+
+def test_needs_rehash():
+    stored = auth_utils.hash_password('pw', 1000)
+    assert auth_utils.needs_rehash('pw', 1000)  # plaintext
+    assert not auth_utils.needs_rehash(stored, 1000)
+    assert auth_utils.needs_rehash(stored, 2000)  # cost changed
+
+
+def test_verification_cache_only_hits_for_same_hash_and_password(clock):
+    cache = VerificationCache(max_entries=2, ttl=10)
+    cache.add('hash-a', 'pw')
+    assert cache.get('hash-a', 'pw')
+    assert not cache.get('hash-a', 'other')
+    assert not cache.get('hash-b', 'pw')
+
+    clock.now += 11
+    assert not cache.get('hash-a', 'pw')
+
+
+def test_verification_cache_is_bounded(clock):
+    cache = VerificationCache(max_entries=2, ttl=10)
+    for i in range(3):
+        cache.add(f'hash-{i}', 'pw')
+    assert not cache.get('hash-0', 'pw')
+    assert cache.get('hash-2', 'pw')
+
+
+def test_rate_limiter_window_and_retry_after(clock):
+    limiter = SlidingWindowRateLimiter(limit=3, window=60)
+    for _ in range(3):
+        assert not limiter.is_limited('k')
+        limiter.hit('k')
+        clock.now += 10
+    assert limiter.is_limited('k')
+    # Oldest hit was at t=1000, now is t=1030, so it leaves the window in 30s
+    assert limiter.retry_after('k') == 31
+
+    clock.now += 31
+    assert not limiter.is_limited('k')
+    assert limiter.retry_after('other') == 0
+
+
+def test_rate_limiter_reset(clock):
+    limiter = SlidingWindowRateLimiter(limit=1, window=60)
+    limiter.hit('k')
+    assert limiter.is_limited('k')
+    limiter.reset('k')
+    assert not limiter.is_limited('k')
+
+
+def test_rate_limiter_sweeps_expired_keys(clock):
+    limiter = SlidingWindowRateLimiter(limit=5, window=60)
+    for i in range(100):
+        limiter.hit(f'user{i}@x.com')
+    assert len(limiter) == 100
+
+    clock.now += 61
+    limiter.hit('new@x.com')
+    assert len(limiter) == 1
+
+
+def test_rate_limiter_caps_keys(clock):
+    limiter = SlidingWindowRateLimiter(limit=5, window=60, max_keys=10)
+    for i in range(50):
+        limiter.hit(f'user{i}@x.com')
+    assert len(limiter) == 10
+    assert limiter.retry_after('user49@x.com') > 0
+    assert limiter.retry_after('user0@x.com') == 0
@@ -0,0 +1,83 @@
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from image_processor import analyze_plant_health, analyze_tiles, image_dimensions, pixel_stats
+
+
+def test_image_dimensions_png_and_jpeg(tmp_path, leaf_file, make_leaf):
+    assert image_dimensions(leaf_file('leaf.png', width=64, height=48)) == (64, 48)
+    assert image_dimensions(leaf_file('leaf.jpg', width=640, height=480)) == (640, 480)
+
+    progressive = str(tmp_path / 'progressive.jpg')
+    cv2.imwrite(progressive, make_leaf(width=70, height=30), [cv2.IMWRITE_JPEG_PROGRESSIVE, 1])
+    assert image_dimensions(progressive) == (70, 30)
+
+
+def test_image_dimensions_gif_and_unknown(tmp_path):
+    gif = tmp_path / 'leaf.gif'
+    gif.write_bytes(b'GIF89a' + struct.pack('<HH', 300, 200) + b'\x00' * 16)
+    assert image_dimensions(str(gif)) == (300, 200)
+
+    other = tmp_path / 'leaf.bmp'
+    other.write_bytes(b'BM' + b'\x00' * 60)
+    assert image_dimensions(str(other)) is None
+
+
+def test_oversized_image_rejected_before_decoding(leaf_file):
+    path = leaf_file(width=200, height=100)
+    assert analyze_plant_health(path, max_pixels=20000)['status'] == 'Healthy'
+
+    result = analyze_plant_health(path, max_pixels=19999)
+    assert result['status'] == 'Error'
+    assert result['disease_name'] == 'Image Too Large'
+    assert 'features' not in result
+
+
+def test_unrecognized_format_rejected_when_limited(leaf_file):
+    bmp = leaf_file('leaf.bmp', width=10, height=10)
+    path = bmp.replace('.bmp', '.png')
+    with open(bmp, 'rb') as src, open(path, 'wb') as dst:
+        dst.write(src.read())
+    assert analyze_plant_health(path, max_pixels=1000)['disease_name'] == 'Invalid Image'
+    assert analyze_plant_health(path)['status'] == 'Healthy'
+
+
+@pytest.mark.parametrize('width, height, tile_size', [(300, 200, 64), (256, 128, 64), (50, 40, 64), (301, 97, 32)])
+def test_tiled_analysis_matches_whole_image(tmp_path, make_leaf, width, height, tile_size):
+    # Random colors on every other row exercise every histogram bin; the patch crosses tile boundaries
+    img = make_leaf(width=width, height=height, patches=[(10, 60, 20, 90)])
+    img[::2] = np.random.default_rng(width).integers(0, 256, img[::2].shape, dtype=np.uint8)
+    path = str(tmp_path / 'leaf.png')
+    cv2.imwrite(path, img)
+
+    whole = analyze_plant_health(path)
+    tiled = analyze_plant_health(path, tile_size=tile_size)
+    for key in ('status', 'disease_name', 'confidence', 'features'):
+        assert tiled[key] == whole[key], key
+    assert tiled['tile_size'] == tile_size
+    assert 'heatmap' not in whole
+
+
+def test_heatmap_marks_diseased_tile(make_leaf):
+    # 250x180 in 64px tiles: 3 rows x 4 columns, with partial tiles on the right and bottom
+    # Diseased: tile (1, 2), the whole bottom-right (partial) tile and half of the top-left tile
+    img = make_leaf(width=250, height=180, patches=[(64, 128, 128, 192), (128, 180, 192, 250), (0, 32, 0, 64)])
+    stats, heatmap = analyze_tiles(img, tile_size=64)
+
+    assert np.array_equal(stats, pixel_stats(img))
+    assert [len(row) for row in heatmap] == [4, 4, 4]
+    assert heatmap[1][2] == 100.0
+    assert heatmap[2][3] == 100.0
+    assert heatmap[0][0] == 50.0
+    diseased = {(1, 2), (2, 3), (0, 0)}
+    assert all(heatmap[r][c] == 0 for r in range(3) for c in range(4) if (r, c) not in diseased)
+
+
+def test_tiling_only_above_min_pixels(leaf_file):
+    path = leaf_file(width=100, height=100, diseased_pixels=500)
+    assert 'heatmap' not in analyze_plant_health(path, tile_size=32, tile_min_pixels=10001)
+    result = analyze_plant_health(path, tile_size=32, tile_min_pixels=10000)
+    assert [len(row) for row in result['heatmap']] == [4, 4, 4, 4]
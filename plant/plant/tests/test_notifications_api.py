@@ -0,0 +1,82 @@
+
+def create_notifications(client, count):
+    for _ in range(count):
+        client.post('/api/test-notification')
+    return [n['id'] for n in client.get('/api/notifications/list').json['notifications']]
+
+
+def test_mark_read_batch_by_ids(client):
+    ids = create_notifications(client, 3)
+    response = client.post('/api/notifications/read', json={'ids': ids[:2]})
+    assert response.status_code == 200
+    assert response.json['updated'] == 2
+    assert client.get('/api/notifications/unread').json['count'] == 1
+
+
+def test_mark_read_up_to_id(client):
+    ids = create_notifications(client, 3)
+    response = client.post('/api/notifications/read', json={'up_to_id': max(ids)})
+    assert response.json['updated'] == 3
+    assert client.get('/api/notifications/unread').json['count'] == 0
+
+
+def test_mark_read_rejects_non_list_ids(client):
+    create_notifications(client, 3)
+    for body in ({'ids': '12'}, {'ids': [1, '2']}, {'ids': [True]}, {'ids': {'1': 1}},
+                 {'up_to_id': '5'}, {}, ['ids'], {'ids': [2**70]}, {'ids': [-2**63 - 1]}, {'up_to_id': 2**63},
+                 {'ids': [1], 'up_to_id': 5}):
+        response = client.post('/api/notifications/read', json=body)
+        assert response.status_code == 400, body
+    assert client.get('/api/notifications/unread').json['count'] == 3
+
+
+def test_mark_read_requires_login(app):
+    response = app.test_client().post('/api/notifications/read', json={'ids': [1]})
+    assert response.status_code == 401
+
+
+def test_list_since_id_and_etag(client):
+    ids = create_notifications(client, 3)
+    newest = max(ids)
+
+    response = client.get(f'/api/notifications/list?since_id={newest - 1}')
+    assert [n['id'] for n in response.json['notifications']] == [newest]
+    etag = response.headers['ETag']
+
+    unchanged = client.get(f'/api/notifications/list?since_id={newest - 1}', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+
+    client.post('/api/notifications/read', json={'ids': [newest]})
+    changed = client.get(f'/api/notifications/list?since_id={newest - 1}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+
+
+def test_list_without_notifications(client):
+    response = client.get('/api/notifications/list?since_id=0')
+    assert response.json['notifications'] == []
+    assert response.json['latest_id'] == 0
+    assert response.json['unread_count'] == 0
+
+
+def test_list_all_newest_first(client):
+    ids = create_notifications(client, 3)
+    client.post('/api/notifications/read', json={'ids': [min(ids)]})
+    response = client.get('/api/notifications/list')
+    assert [n['id'] for n in response.json['notifications']] == sorted(ids, reverse=True)
+    assert response.json['latest_id'] == max(ids)
+    assert response.json['unread_count'] == 2
+    assert 'unread' not in response.json['notifications'][0]
+
+
+def test_async_list_matches_flask(client, asgi_get):
+    ids = create_notifications(client, 3)
+    since = f'since_id={min(ids)}'.encode()
+    flask_response = client.get(f'/api/notifications/list?since_id={min(ids)}')
+
+    status, headers, payload = asgi_get('/api/notifications/list', since)
+    assert status == 200
+    assert payload == flask_response.json
+    assert headers[b'etag'] == flask_response.headers['ETag'].encode()
+
+    status, headers, payload = asgi_get('/api/notifications/list', since, [(b'if-none-match', headers[b'etag'])])
+    assert status == 304
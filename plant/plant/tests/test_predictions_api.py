@@ -0,0 +1,53 @@
+import io
+
+import cv2
+import pytest
+
+
+@pytest.fixture
+def upload_leaf(client, make_leaf):
+    def upload(**form):
+        ok, png = cv2.imencode('.png', make_leaf(width=80, height=60, patches=[(0, 10, 0, 10)]))
+        response = client.post('/detect', data={'plant-image': (io.BytesIO(png.tobytes()), 'leaf.png'),
+                                                'plant-type': 'Tomato', **form})
+        assert response.status_code == 200
+        assert 'features' not in response.json
+        return response.json
+
+    return upload
+
+
+@pytest.fixture(autouse=True)
+def upload_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+
+
+def test_history_after_detect(client, upload_leaf):
+    result = upload_leaf()
+
+    response = client.get('/api/history')
+    assert response.status_code == 200
+    history = response.json['history']
+    assert len(history) == 1
+    assert history[0]['disease_name'] == result['disease_name']
+    assert history[0]['plant_type'] == 'Tomato'
+    assert 'features' not in history[0]
+
+
+def test_async_history_after_detect(upload_leaf, asgi_get):
+    upload_leaf()
+    status, headers, payload = asgi_get('/api/history')
+    assert status == 200
+    assert len(payload['history']) == 1
+    assert 'features' not in payload['history'][0]
+
+
+def test_detect_tiled_returns_heatmap(client, upload_leaf, app):
+    whole = upload_leaf()
+    assert 'heatmap' not in whole
+
+    tiled = upload_leaf(tiled='1')
+    tile_size = app.config['ANALYSIS_TILE_SIZE']
+    assert tiled['tile_size'] == tile_size
+    assert tiled['heatmap'] == [[round(100 / (80 * 60) * 100, 2)]]  # one tile holds the whole 80x60 image
+    assert tiled['confidence'] == whole['confidence']
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from image_processor import FEATURE_DTYPE, FEATURE_NAMES, analyze_plant_health, pack_features, unpack_features
+from rescore import rescore
+from storage import SQLiteBackend, Storage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return Storage(SQLiteBackend(str(tmp_path / 'plants.db')))
+
+
+def detect(storage, path, **kwargs):
+    result = analyze_plant_health(path, **kwargs)
+    storage.predictions.add(1, path, 'Tomato', result['disease_name'], result['status'],
+                            result['confidence'], result['features'])
+    return result
+
+
+def test_rescore_with_current_thresholds_changes_nothing(leaf_file, storage):
+    # 300 of 10000 pixels is exactly on the 3% Healthy/Non-Critical boundary
+    for pixels in (0, 150, 299, 300, 301, 1000, 2500, 6000):
+        detect(storage, leaf_file(f'leaf{pixels}.png', diseased_pixels=pixels))
+    # severity is exactly 3.0, which is not below the Healthy bound
+    assert detect(storage, leaf_file('leaf300.png', diseased_pixels=300), tile_size=32)['status'] == 'Non-Critical'
+
+    summary = rescore(storage, apply=True)
+    assert summary['total'] == 9
+    assert summary['changed'] == 0
+
+
+def test_rescore_applies_new_thresholds(leaf_file, storage):
+    detect(storage, leaf_file(diseased_pixels=500))  # 5%: Non-Critical
+    assert rescore(storage, thresholds=[6, 10, 25])['changed'] == 1
+
+    rescore(storage, thresholds=[6, 10, 25], apply=True)
+    assert storage.predictions.for_user(1)[0]['status'] == 'Healthy'
+    assert rescore(storage, thresholds=[6, 10, 25])['changed'] == 0
+
+
+def test_features_round_trip_exactly():
+    counts = np.arange(len(FEATURE_NAMES), dtype=np.int64) * 7
+    blobs = [pack_features(counts, 10000), pack_features(counts * 2, 30000)]
+    assert len(blobs[0]) == FEATURE_DTYPE.itemsize == 1 + 4 + 4 * len(FEATURE_NAMES) == 149
+    assert len(blobs[0]) <= 255  # fits predictions.features VARBINARY(255)
+    features = unpack_features(blobs)
+    assert features.dtype == np.float64
+    assert np.array_equal(features[0], counts / 10000)
+    assert np.array_equal(features[1], counts * 2 / 30000)
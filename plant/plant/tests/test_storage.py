@@ -0,0 +1,36 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from storage import SQLiteBackend, Storage
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    """Run in a timezone far from UTC so UTC and local timestamps differ."""
+    monkeypatch.setenv('TZ', 'Asia/Kolkata')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_sqlite_timestamps_are_local_time(tmp_path, local_timezone):
+    storage = Storage(SQLiteBackend(str(tmp_path / 'plants.db')))
+    notification_id = storage.notifications.create(1, 'system', 'Title', 'Message')
+    storage.notifications.mark_read_many(1, ids=[notification_id])
+
+    notification = storage.notifications.list_for_user(1)[0]
+    now = datetime.now()
+    assert abs(notification['created_at'] - now) < timedelta(minutes=1)
+    assert abs(notification['read_at'] - now) < timedelta(minutes=1)
+    assert abs(storage.users.get_by_email('admin@plant.com')['created_at'] - now) < timedelta(minutes=1)
+
+
+def test_mark_read_many_rejects_ids_and_up_to_id(tmp_path):
+    storage = Storage(SQLiteBackend(str(tmp_path / 'plants.db')))
+    notification_id = storage.notifications.create(1, 'system', 'Title', 'Message')
+    with pytest.raises(ValueError):
+        storage.notifications.mark_read_many(1, ids=[notification_id], up_to_id=notification_id)
+    assert storage.notifications.unread_count(1) == 1